@@ -6,57 +6,262 @@ Uses ChromaDB for vector storage and similarity search
 import chromadb
 from chromadb.config import Settings
 import json
+import hashlib
+import heapq
+from collections import Counter, OrderedDict, defaultdict
 from datetime import datetime
-from typing import List, Dict, Tuple, Optional
-from sentence_transformers import SentenceTransformer
+from typing import TYPE_CHECKING, List, Dict, Tuple, Optional
+import numpy as np
 import uuid
 import os
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library
+    orjson = None
+
+# Sentence transformer models shared by every RAGDatabase in the process,
+# keyed by (model name, backend)
+_MODEL_CACHE: Dict[Tuple[str, str], "SentenceTransformer"] = {}
+
+# Marker file written once legacy JSON hashtags have been converted
+HASHTAG_MIGRATION_MARKER = "_hashtags_migrated"
+
+# File inside the database directory holding the last content analysis
+ANALYSIS_CACHE_FILE = "_analysis.json"
+
+# Maximum number of query embeddings kept in memory per database instance
+QUERY_CACHE_SIZE = 512
+
+def _get_model(name: str, backend: str = "torch") -> "SentenceTransformer":
+    """Load a sentence transformer model once and reuse it afterwards"""
+    model = _MODEL_CACHE.get((name, backend))
+    if model is None:
+        # Imported here so commands that never embed skip the heavy import
+        import torch
+        from sentence_transformers import SentenceTransformer
+        
+        print("Loading sentence transformer model...")
+        model = SentenceTransformer(name, backend=backend)
+        if backend == "torch" and torch.cuda.is_available():
+            model = model.half()  # FP16 halves memory traffic on GPU
+        _MODEL_CACHE[(name, backend)] = model
+    return model
+
+def _json_dumps(value) -> str:
+    """Serialize a value to a JSON string"""
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value)
+
+def _json_loads(value: str):
+    """Parse a JSON string"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+def _join_hashtags(hashtags: List[str]) -> str:
+    """Encode a hashtag list for ChromaDB metadata"""
+    for hashtag in hashtags:
+        if ',' in hashtag:
+            raise ValueError(f"Hashtag {hashtag!r} must not contain a comma")
+    return ','.join(hashtags)
+
+def _parse_legacy_hashtags(value: str) -> Optional[List[str]]:
+    """Decode a hashtag list stored as JSON by older versions, or None if value is not one"""
+    if not value.startswith('['):
+        return None
+    try:
+        hashtags = _json_loads(value)
+    except ValueError:  # A comma-joined value whose first tag starts with '['
+        return None
+    if isinstance(hashtags, list) and all(isinstance(tag, str) for tag in hashtags):
+        return hashtags
+    return None
+
+def _parse_hashtags(value: str, legacy: bool = False) -> List[str]:
+    """Decode hashtags stored in ChromaDB metadata
+    
+    Set legacy when the database may still hold JSON-encoded rows, i.e. the
+    one-time migration could not be recorded.
+    """
+    if not value:
+        return []
+    if legacy:
+        hashtags = _parse_legacy_hashtags(value)
+        if hashtags is not None:
+            return hashtags
+    return value.split(',')
+
+def _top_by_engagement(posts: List[Dict], limit: Optional[int] = None) -> List[Dict]:
+    """Order posts by engagement (highest first), keeping at most limit posts"""
+    if limit is None:
+        return sorted(posts, key=lambda x: x['engagement'], reverse=True)
+    return heapq.nlargest(limit, posts, key=lambda x: x['engagement'])
+
 class RAGDatabase:
-    def __init__(self, db_path: str = "./chroma_db"):
-        """Initialize ChromaDB and sentence transformer model"""
+    def __init__(self, db_path: str = "./chroma_db", use_onnx: bool = False):
+        """Initialize ChromaDB and sentence transformer model
+        
+        Set use_onnx to run the embedding model on ONNX Runtime instead of
+        PyTorch (requires the optimum package).
+        """
         self.db_path = db_path
+        self._init_storage()
+        
+        # Sentence transformer for embeddings, loaded on first use
+        self._model_backend = "onnx" if use_onnx else "torch"
         
-        # Initialize ChromaDB
-        self.chroma_client = chromadb.PersistentClient(path=db_path)
+        # LRU cache of query embeddings, keyed by SHA-256 of the query text
+        self._embed_cache: OrderedDict = OrderedDict()
+        
+        # Content analysis cached in memory and on disk, keyed by post count
+        self._analysis_cache_path = os.path.join(db_path, ANALYSIS_CACHE_FILE)
+        self._analysis_cache: Optional[Tuple[int, Dict]] = None
+        print("✅ RAG Database initialized")
+    
+    def _init_storage(self):
+        """Open the ChromaDB collection that stores the posts"""
+        self.chroma_client = chromadb.PersistentClient(path=self.db_path)
         
         # Get or create collection
         self.collection = self.chroma_client.get_or_create_collection(
             name="instagram_posts",
-            metadata={"description": "Instagram posts with embeddings"}
+            metadata={
+                "description": "Instagram posts with embeddings",
+                "hnsw:space": "cosine"  # Embeddings are unit-normalized at write
+            }
         )
         
-        # Initialize sentence transformer for embeddings
-        print("Loading sentence transformer model...")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("✅ RAG Database initialized")
+        # Collections created before the switch to cosine keep their original
+        # distance function, so similarity scores depend on the stored space
+        self._distance_space = self._get_distance_space()
+        
+        self._migrate_legacy_hashtags()
+    
+    def _get_distance_space(self) -> str:
+        """Read the distance function the collection was created with"""
+        configuration = getattr(self.collection, 'configuration_json', None) or {}
+        space = (configuration.get('hnsw') or {}).get('space')
+        if not space:
+            space = (self.collection.metadata or {}).get('hnsw:space', 'l2')
+        return space
+    
+    def _distance_to_similarity(self, distance: float) -> float:
+        """Convert a Chroma distance between unit vectors to cosine similarity"""
+        if self._distance_space == 'l2':
+            return 1 - distance / 2  # Squared L2 distance is 2 - 2 * cos
+        return 1 - distance  # Cosine and inner-product distance are 1 - cos
+    
+    def _migrate_legacy_hashtags(self):
+        """Rewrite hashtags stored as JSON lists in the comma-joined format (runs once per database)"""
+        marker_path = os.path.join(self.db_path, HASHTAG_MIGRATION_MARKER)
+        if os.path.exists(marker_path):
+            self._legacy_hashtags = False
+            return
+        
+        results = self.collection.get(include=['metadatas'])
+        legacy_ids = []
+        legacy_metadatas = []
+        for post_id, metadata in zip(results['ids'], results['metadatas'] or []):
+            hashtags = _parse_legacy_hashtags(metadata.get('hashtags', ''))
+            if hashtags is not None:
+                legacy_ids.append(post_id)
+                # Tags with commas could not have been entered through the CLI
+                legacy_metadatas.append({**metadata, 'hashtags': ','.join(
+                    tag.replace(',', '') for tag in hashtags
+                )})
+        
+        if legacy_ids:
+            self.collection.update(ids=legacy_ids, metadatas=legacy_metadatas)
+        
+        try:
+            with open(marker_path, 'w', encoding='utf-8'):
+                pass
+            self._legacy_hashtags = False
+        except OSError:
+            # Retried the next time the database is opened; until then reads
+            # keep recognising JSON-encoded rows
+            self._legacy_hashtags = True
+    
+    @property
+    def model(self) -> "SentenceTransformer":
+        """Sentence transformer used for embeddings"""
+        return _get_model('all-MiniLM-L6-v2', backend=self._model_backend)
+    
+    def _encode(self, texts, **kwargs):
+        """Run the embedding model without autograd bookkeeping"""
+        model = self.model
+        import torch
+        
+        with torch.inference_mode():
+            return model.encode(texts, **kwargs)
     
     def add_post(self, post_data: Dict) -> str:
         """Add a post to the vector database"""
-        post_id = str(uuid.uuid4())
+        return self.add_posts([post_data])[0]
+    
+    def add_posts(self, posts: List[Dict]) -> List[str]:
+        """Add several posts to the vector database with a single encoder pass"""
+        if not posts:
+            return []
         
-        # Create embedding from caption and hashtags
-        text_for_embedding = f"{post_data['caption']} {' '.join(post_data.get('hashtags', []))}"
-        embedding = self.model.encode(text_for_embedding).tolist()
+        post_ids = [str(uuid.uuid4()) for _ in posts]
+        
+        # Build metadata first so invalid hashtags are rejected before encoding
+        metadatas = [{
+            'type': p['type'],
+            'engagement': p['engagement'],
+            'hashtags': _join_hashtags(p.get('hashtags', [])),
+            'date_posted': p['date_posted']
+        } for p in posts]
+        
+        # Create embeddings from caption and hashtags in one batch.
+        # encode() already sorts inputs by length before batching (and restores
+        # the original order), so padding is kept to a minimum without a
+        # manual sort/un-permute here.
+        texts = [f"{p['caption']} {' '.join(p.get('hashtags', []))}" for p in posts]
+        embeddings = self._encode(
+            texts,
+            batch_size=64,
+            show_progress_bar=False,
+            normalize_embeddings=True
+        ).tolist()
         
         # Add to ChromaDB
         self.collection.add(
-            embeddings=[embedding],
-            documents=[post_data['caption']],
-            metadatas=[{
-                'type': post_data['type'],
-                'engagement': post_data['engagement'],
-                'hashtags': json.dumps(post_data.get('hashtags', [])),
-                'date_posted': post_data['date_posted']
-            }],
-            ids=[post_id]
+            embeddings=embeddings,
+            documents=[p['caption'] for p in posts],
+            metadatas=metadatas,
+            ids=post_ids
         )
         
-        return post_id
+        self._invalidate_analysis_cache()
+        
+        return post_ids
+    
+    def _encode_query(self, query: str) -> List[float]:
+        """Embed a search query, reusing the cached embedding for repeated queries"""
+        key = hashlib.sha256(query.encode('utf-8')).hexdigest()
+        
+        embedding = self._embed_cache.get(key)
+        if embedding is not None:
+            self._embed_cache.move_to_end(key)
+            return embedding
+        
+        embedding = self._encode(query, normalize_embeddings=True).tolist()
+        self._embed_cache[key] = embedding
+        if len(self._embed_cache) > QUERY_CACHE_SIZE:
+            self._embed_cache.popitem(last=False)  # Evict least recently used
+        
+        return embedding
     
     def search_similar_content(self, query: str, limit: int = 5) -> List[Tuple[Dict, float]]:
         """Search for similar content using vector similarity"""
-        query_embedding = self.model.encode(query).tolist()
+        query_embedding = self._encode_query(query)
         
         results = self.collection.query(
             query_embeddings=[query_embedding],
@@ -70,10 +275,10 @@ class RAGDatabase:
                     'caption': results['documents'][0][i],
                     'type': results['metadatas'][0][i]['type'],
                     'engagement': results['metadatas'][0][i]['engagement'],
-                    'hashtags': json.loads(results['metadatas'][0][i]['hashtags']),
+                    'hashtags': _parse_hashtags(results['metadatas'][0][i]['hashtags'], self._legacy_hashtags),
                     'date_posted': results['metadatas'][0][i]['date_posted']
                 }
-                similarity_score = 1 - results['distances'][0][i]  # Convert distance to similarity
+                similarity_score = self._distance_to_similarity(results['distances'][0][i])
                 similar_posts.append((post_data, similarity_score))
         
         return similar_posts
@@ -90,21 +295,45 @@ class RAGDatabase:
                     'caption': results['documents'][i],
                     'type': results['metadatas'][i]['type'],
                     'engagement': results['metadatas'][i]['engagement'],
-                    'hashtags': json.loads(results['metadatas'][i]['hashtags']),
+                    'hashtags': _parse_hashtags(results['metadatas'][i]['hashtags'], self._legacy_hashtags),
                     'date_posted': results['metadatas'][i]['date_posted']
                 }
                 posts.append(post_data)
         
         return posts
     
-    def get_recent_posts(self, limit: int = 10) -> List[Dict]:
-        """Get recent posts sorted by date"""
-        posts = self.get_all_posts()
+    def get_recent_posts(self, limit: int = 10, posts: Optional[List[Dict]] = None) -> List[Dict]:
+        """Get recent posts sorted by date
+        
+        Pass posts from get_all_posts() to select from an existing fetch.
+        """
+        if posts is not None:
+            return heapq.nlargest(limit, posts, key=lambda x: x['date_posted'])
+        
+        results = self.collection.get(include=['metadatas', 'documents'])
+        
+        if not results['documents']:
+            return []
         
-        # Sort by date (most recent first)
-        posts.sort(key=lambda x: x['date_posted'], reverse=True)
+        # Select the most recent rows (ISO dates sort chronologically) and
+        # only build post dicts for those
+        recent = heapq.nlargest(
+            limit,
+            zip(results['ids'], results['documents'], results['metadatas']),
+            key=lambda row: row[2]['date_posted']
+        )
         
-        return posts[:limit]
+        return [
+            {
+                'id': post_id,
+                'caption': caption,
+                'type': metadata['type'],
+                'engagement': metadata['engagement'],
+                'hashtags': _parse_hashtags(metadata['hashtags'], self._legacy_hashtags),
+                'date_posted': metadata['date_posted']
+            }
+            for post_id, caption, metadata in recent
+        ]
     
     def get_posts_by_type(self, post_type: str) -> List[Dict]:
         """Get all posts of a specific type"""
@@ -119,15 +348,25 @@ class RAGDatabase:
                     'caption': results['documents'][i],
                     'type': results['metadatas'][i]['type'],
                     'engagement': results['metadatas'][i]['engagement'],
-                    'hashtags': json.loads(results['metadatas'][i]['hashtags']),
+                    'hashtags': _parse_hashtags(results['metadatas'][i]['hashtags'], self._legacy_hashtags),
                     'date_posted': results['metadatas'][i]['date_posted']
                 }
                 posts.append(post_data)
         
         return posts
     
-    def get_high_engagement_posts(self, min_engagement: int = 1000) -> List[Dict]:
-        """Get posts with high engagement"""
+    def get_high_engagement_posts(self, min_engagement: int = 1000,
+                                  posts: Optional[List[Dict]] = None,
+                                  limit: Optional[int] = None) -> List[Dict]:
+        """Get posts with high engagement, highest first
+        
+        Pass posts from get_all_posts() to filter an existing fetch, and
+        limit to only keep the top posts.
+        """
+        if posts is not None:
+            posts = [post for post in posts if post['engagement'] >= min_engagement]
+            return _top_by_engagement(posts, limit)
+        
         results = self.collection.get(
             where={"engagement": {"$gte": min_engagement}}
         )
@@ -139,69 +378,323 @@ class RAGDatabase:
                     'caption': results['documents'][i],
                     'type': results['metadatas'][i]['type'],
                     'engagement': results['metadatas'][i]['engagement'],
-                    'hashtags': json.loads(results['metadatas'][i]['hashtags']),
+                    'hashtags': _parse_hashtags(results['metadatas'][i]['hashtags'], self._legacy_hashtags),
                     'date_posted': results['metadatas'][i]['date_posted']
                 }
                 posts.append(post_data)
         
-        # Sort by engagement (highest first)
-        posts.sort(key=lambda x: x['engagement'], reverse=True)
-        
-        return posts
+        return _top_by_engagement(posts, limit)
     
     def get_post_count(self) -> int:
         """Get total number of posts in database"""
         return self.collection.count()
     
-    def get_content_analysis(self) -> Dict:
-        """Get analysis of content patterns"""
-        posts = self.get_all_posts()
+    def _get_metadatas_only(self) -> List[Dict]:
+        """Get the metadata of every post, skipping documents and embeddings"""
+        results = self.collection.get(include=['metadatas'])
+        return results['metadatas'] or []
+    
+    def _load_cached_analysis(self, post_count: int) -> Optional[Dict]:
+        """Return the cached content analysis if it matches the post count"""
+        if self._analysis_cache is None:
+            try:
+                with open(self._analysis_cache_path, 'r', encoding='utf-8') as f:
+                    cached = _json_loads(f.read())
+                self._analysis_cache = (cached['post_count'], cached['analysis'])
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+        
+        cached_count, analysis = self._analysis_cache
+        return analysis if cached_count == post_count else None
+    
+    def _save_cached_analysis(self, post_count: int, analysis: Dict):
+        """Store a content analysis in memory and next to the database"""
+        self._analysis_cache = (post_count, analysis)
+        try:
+            with open(self._analysis_cache_path, 'w', encoding='utf-8') as f:
+                f.write(_json_dumps({'post_count': post_count, 'analysis': analysis}))
+        except OSError:
+            pass  # The cache is an optimization only
+    
+    def _invalidate_analysis_cache(self):
+        """Drop the cached content analysis after the posts changed"""
+        self._analysis_cache = None
+        try:
+            os.remove(self._analysis_cache_path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            pass  # A stale file is rejected by its post count
+    
+    def get_content_analysis(self, posts: Optional[List[Dict]] = None,
+                             all_posts: bool = False) -> Dict:
+        """Get analysis of content patterns
+        
+        Without posts the whole database is analyzed, and the result is cached
+        until posts are added. Pass a list of posts (e.g. from
+        get_posts_by_type()) to analyze just those; that result is not cached.
+        Set all_posts when the list is the whole database (from get_all_posts())
+        so it can use and fill the cache without another fetch.
+        """
+        if posts is not None and not all_posts:
+            return self._analyze_posts(posts)
+        
+        post_count = self.get_post_count() if posts is None else len(posts)
+        if not post_count:
+            return {}
+        
+        analysis = self._load_cached_analysis(post_count)
+        if analysis is not None:
+            return analysis
+        
+        analysis = self._analyze_all_posts() if posts is None else self._analyze_posts(posts)
+        if analysis:
+            self._save_cached_analysis(analysis['total_posts'], analysis)
         
+        return analysis
+    
+    def _analyze_all_posts(self) -> Dict:
+        """Analyze every post in the database from a metadata-only fetch"""
+        metadatas = self._get_metadatas_only()
+        if not metadatas:
+            return {}
+        
+        hashtag_lists = [_parse_hashtags(metadata['hashtags'], self._legacy_hashtags) for metadata in metadatas]
+        return self._analyze_content(metadatas, hashtag_lists)
+    
+    def _analyze_posts(self, posts: List[Dict]) -> Dict:
+        """Analyze a list of post dicts"""
         if not posts:
             return {}
         
-        # Analyze post types
-        type_counts = {}
-        type_engagement = {}
+        # Post dicts carry the same 'type'/'engagement' keys as metadata
+        return self._analyze_content(posts, [post['hashtags'] for post in posts])
+    
+    def _analyze_content(self, metadatas: List[Dict], hashtag_lists: List[List[str]]) -> Dict:
+        """Aggregate post type and hashtag statistics"""
+        # Analyze post types (vectorized over all posts)
+        types = np.array([metadata['type'] for metadata in metadatas])
+        engagements = np.array([metadata['engagement'] for metadata in metadatas], dtype=np.int64)
+        
+        unique_types, first_seen, type_codes = np.unique(
+            types, return_index=True, return_inverse=True
+        )
+        type_totals = np.bincount(type_codes)
+        type_sums = np.bincount(type_codes, weights=engagements)
+        
+        # np.unique sorts alphabetically; report types in first-seen order
+        order = np.argsort(first_seen)
+        type_names = unique_types[order].tolist()
+        type_counts = dict(zip(type_names, type_totals[order].tolist()))
+        avg_engagement_by_type = dict(zip(type_names, (type_sums / type_totals)[order].tolist()))
         
         # Analyze hashtags
-        hashtag_counts = {}
-        hashtag_engagement = {}
-        
-        total_engagement = 0
-        
-        for post in posts:
-            # Post type analysis
-            post_type = post['type']
-            type_counts[post_type] = type_counts.get(post_type, 0) + 1
-            if post_type not in type_engagement:
-                type_engagement[post_type] = []
-            type_engagement[post_type].append(post['engagement'])
-            
-            # Hashtag analysis
-            for hashtag in post['hashtags']:
-                hashtag_counts[hashtag] = hashtag_counts.get(hashtag, 0) + 1
-                if hashtag not in hashtag_engagement:
-                    hashtag_engagement[hashtag] = []
-                hashtag_engagement[hashtag].append(post['engagement'])
-            
-            total_engagement += post['engagement']
+        hashtag_counts = Counter()
+        hashtag_engagement = defaultdict(list)
         
-        # Calculate averages
-        avg_engagement_by_type = {}
-        for post_type, engagements in type_engagement.items():
-            avg_engagement_by_type[post_type] = sum(engagements) / len(engagements)
+        for metadata, hashtags in zip(metadatas, hashtag_lists):
+            hashtag_counts.update(hashtags)
+            for hashtag in hashtags:
+                hashtag_engagement[hashtag].append(metadata['engagement'])
         
-        avg_engagement_by_hashtag = {}
-        for hashtag, engagements in hashtag_engagement.items():
-            if len(engagements) >= 2:  # Only include hashtags used multiple times
-                avg_engagement_by_hashtag[hashtag] = sum(engagements) / len(engagements)
+        avg_engagement_by_hashtag = {
+            hashtag: sum(values) / len(values)
+            for hashtag, values in hashtag_engagement.items()
+            if len(values) >= 2  # Only include hashtags used multiple times
+        }
         
         return {
-            'total_posts': len(posts),
-            'avg_engagement': total_engagement / len(posts) if posts else 0,
+            'total_posts': len(metadatas),
+            'avg_engagement': float(engagements.mean()),
             'type_distribution': type_counts,
             'avg_engagement_by_type': avg_engagement_by_type,
-            'top_hashtags': dict(sorted(hashtag_counts.items(), key=lambda x: x[1], reverse=True)[:10]),
-            'best_performing_hashtags': dict(sorted(avg_engagement_by_hashtag.items(), key=lambda x: x[1], reverse=True)[:10])
+            'top_hashtags': dict(hashtag_counts.most_common(10)),
+            'best_performing_hashtags': dict(Counter(avg_engagement_by_hashtag).most_common(10))
         }
+
+
+class InMemoryRAGDatabase(RAGDatabase):
+    """RAG database backed by an exact FAISS inner-product index
+    
+    Meant for small accounts (up to a few hundred posts), where a flat index
+    is faster and lighter than ChromaDB's HNSW index. Posts are kept in
+    memory and written to db_path after every add. Writers serialize on a
+    lock file and replace each file atomically. Requires faiss.
+    """
+    
+    def __init__(self, db_path: str = "./faiss_db", use_onnx: bool = False):
+        # Imported here so importing this module stays cheap for the Chroma path
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("InMemoryRAGDatabase requires faiss (pip install faiss-cpu)") from e
+        from filelock import FileLock
+        
+        self._faiss = faiss
+        self._file_lock_class = FileLock
+        super().__init__(db_path=db_path, use_onnx=use_onnx)
+    
+    def _init_storage(self):
+        """Load the FAISS index and post list from disk, if present"""
+        os.makedirs(self.db_path, exist_ok=True)
+        self._index_path = os.path.join(self.db_path, "posts.index")
+        self._posts_path = os.path.join(self.db_path, "posts.json")
+        self._lock = self._file_lock_class(os.path.join(self.db_path, "posts.lock"))
+        
+        with self._lock:
+            self._load()
+    
+    def _load(self):
+        """Read the index and post list from disk (call with the lock held)
+        
+        posts.json is written last on every save, so it decides which posts
+        exist. Vectors left over from an interrupted save are dropped.
+        """
+        if not os.path.exists(self._posts_path):
+            self.index = None  # Created on first add, once the dimension is known
+            self._posts = []
+            return
+        
+        with open(self._posts_path, 'r', encoding='utf-8') as f:
+            posts = _json_loads(f.read())
+        index = self._faiss.read_index(self._index_path) if os.path.exists(self._index_path) else None
+        
+        indexed = index.ntotal if index is not None else 0
+        if indexed > len(posts):
+            index.remove_ids(np.arange(len(posts), indexed, dtype='int64'))
+        elif indexed < len(posts):
+            raise RuntimeError(
+                f"FAISS store in {self.db_path} is inconsistent: "
+                f"{indexed} vectors for {len(posts)} posts"
+            )
+        
+        self.index = index
+        self._posts = posts
+    
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """Write a file through a temporary path so readers never see a partial file"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    def _save(self):
+        """Write the index, then the post list (call with the lock held)"""
+        self._write_atomic(self._index_path, self._faiss.serialize_index(self.index).tobytes())
+        self._write_atomic(self._posts_path, _json_dumps(self._posts).encode('utf-8'))
+    
+    def add_posts(self, posts: List[Dict]) -> List[str]:
+        """Add several posts to the index with a single encoder pass"""
+        if not posts:
+            return []
+        
+        post_ids = [str(uuid.uuid4()) for _ in posts]
+        
+        texts = [f"{p['caption']} {' '.join(p.get('hashtags', []))}" for p in posts]
+        embeddings = np.asarray(self._encode(
+            texts,
+            batch_size=64,
+            show_progress_bar=False,
+            normalize_embeddings=True
+        ), dtype='float32')
+        
+        with self._lock:
+            # Pick up posts added by other processes since this store was opened
+            self._load()
+            
+            if self.index is None:
+                self.index = self._faiss.IndexFlatIP(embeddings.shape[1])
+            self.index.add(embeddings)
+            
+            self._posts.extend({
+                'id': post_id,
+                'caption': p['caption'],
+                'type': p['type'],
+                'engagement': p['engagement'],
+                'hashtags': list(p.get('hashtags', [])),
+                'date_posted': p['date_posted']
+            } for post_id, p in zip(post_ids, posts))
+            
+            self._save()
+            self._invalidate_analysis_cache()
+        
+        return post_ids
+    
+    def search_similar_content(self, query: str, limit: int = 5) -> List[Tuple[Dict, float]]:
+        """Search for similar content using exact inner-product similarity"""
+        if self.index is None or not self._posts:
+            return []
+        
+        query_embedding = np.array([self._encode_query(query)], dtype='float32')
+        scores, indices = self.index.search(query_embedding, min(limit, len(self._posts)))
+        
+        similar_posts = []
+        for score, i in zip(scores[0], indices[0]):
+            if i < 0:
+                continue
+            post_data = self._copy_post(self._posts[i], include_id=False)
+            similar_posts.append((post_data, float(score)))  # Cosine similarity on unit vectors
+        
+        return similar_posts
+    
+    @staticmethod
+    def _copy_post(post: Dict, include_id: bool = True) -> Dict:
+        """Copy a stored post so callers cannot modify the database in place
+        
+        Clear include_id for results whose Chroma counterparts carry no id.
+        """
+        copy = {**post, 'hashtags': list(post['hashtags'])}
+        if not include_id:
+            del copy['id']
+        return copy
+    
+    def get_all_posts(self) -> List[Dict]:
+        """Get all posts from the database"""
+        return [self._copy_post(post) for post in self._posts]
+    
+    def get_recent_posts(self, limit: int = 10, posts: Optional[List[Dict]] = None) -> List[Dict]:
+        """Get recent posts sorted by date"""
+        return super().get_recent_posts(limit, posts=self.get_all_posts() if posts is None else posts)
+    
+    def get_posts_by_type(self, post_type: str) -> List[Dict]:
+        """Get all posts of a specific type"""
+        return [
+            self._copy_post(post, include_id=False)
+            for post in self._posts if post['type'] == post_type
+        ]
+    
+    def get_high_engagement_posts(self, min_engagement: int = 1000,
+                                  posts: Optional[List[Dict]] = None,
+                                  limit: Optional[int] = None) -> List[Dict]:
+        """Get posts with high engagement, highest first"""
+        if posts is None:
+            posts = [self._copy_post(post, include_id=False) for post in self._posts]
+        return super().get_high_engagement_posts(min_engagement, posts=posts, limit=limit)
+    
+    def get_post_count(self) -> int:
+        """Get total number of posts in database"""
+        return len(self._posts)
+    
+    def _analyze_all_posts(self) -> Dict:
+        """Analyze every post held in memory"""
+        return self._analyze_posts(self._posts)
+
+
+def open_database(backend: str = "auto") -> RAGDatabase:
+    """Open the post database for the CLI
+    
+    backend is "chroma", "faiss" or "auto". Auto reopens an existing FAISS
+    store and otherwise uses ChromaDB; the FAISS store is only created when
+    asked for explicitly.
+    """
+    if backend == "auto":
+        backend = "faiss" if os.path.isdir("./faiss_db") else "chroma"
+    
+    if backend == "faiss":
+        return InMemoryRAGDatabase()
+    if backend == "chroma":
+        return RAGDatabase()
+    raise ValueError(f"Unknown database backend: {backend!r}")
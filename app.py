@@ -3,17 +3,19 @@ Instagram Next Post Recommender - Multi-Agent System
 Analyzes your existing content and recommends specific next story + feed post
 """
 
+import argparse
 import os
-from autogen import ConversableAgent, GroupChat, GroupChatManager, LLMConfig
-from Database import RAGDatabase
-import json
+from collections import Counter
 from datetime import datetime, timedelta
-import typer
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 class InstagramPostRecommender:
-    def __init__(self):
-        self.rag_db = RAGDatabase()
+    def __init__(self, backend: str = "auto"):
+        # Heavy imports are deferred so that lightweight commands start fast
+        from autogen import LLMConfig
+        from Database import open_database
+        
+        self.rag_db = open_database(backend)
         
         # Configure LLM
         self.llm_config = LLMConfig(
@@ -27,6 +29,7 @@ class InstagramPostRecommender:
     
     def _setup_agents(self):
         """Create specialized agents for story and feed recommendations"""
+        from autogen import ConversableAgent
         
         # Story Strategist - Focuses on Instagram Stories
         story_agent_message = """You are an Instagram Stories Specialist.
@@ -86,6 +89,8 @@ End with "FINAL RECOMMENDATION:" when you have the complete next-post strategy."
 
     def _setup_group_chat(self):
         """Setup group chat for story + feed coordination"""
+        from autogen import GroupChat, GroupChatManager
+        
         self.groupchat = GroupChat(
             agents=[self.coordinator, self.story_agent, self.feed_agent],
             speaker_selection_method="auto",
@@ -103,49 +108,25 @@ End with "FINAL RECOMMENDATION:" when you have the complete next-post strategy."
     def get_next_post_recommendations(self, context: str = ""):
         """Get specific recommendations for next story and feed post"""
         
-        # Get comprehensive account analysis
-        analysis = self.rag_db.get_content_analysis()
-        recent_posts = self.rag_db.get_recent_posts(10)
-        high_performers = self.rag_db.get_high_engagement_posts(min_engagement=1000)
+        # Get comprehensive account analysis from a single database fetch;
+        # the analysis itself is cached between runs
+        posts = self.rag_db.get_all_posts()
+        analysis = self.rag_db.get_content_analysis(posts=posts, all_posts=True)
+        recent_posts = self.rag_db.get_recent_posts(10, posts=posts)
+        high_performers = self.rag_db.get_high_engagement_posts(min_engagement=1000, posts=posts, limit=3)
         
         if not analysis or analysis.get('total_posts', 0) == 0:
             return " No posts in database. Add your existing posts first to get recommendations."
 
-        # Calculate content gaps and timing
+        # Calculate content gaps and timing against a single reference time
+        now = datetime.now()
         content_gaps = self._analyze_content_gaps(recent_posts)
-        posting_rhythm = self._analyze_posting_rhythm(recent_posts)
+        posting_rhythm = self._analyze_posting_rhythm(recent_posts, now)
         
         # Prepare briefing for agents
-        briefing_data = {
-            "account_overview": {
-                "total_posts": analysis.get('total_posts', 0),
-                "avg_engagement": analysis.get('avg_engagement', 0),
-                "content_types": analysis.get('type_distribution', {}),
-                "top_performing_type": max(
-                    analysis.get('avg_engagement_by_type', {}).items(), 
-                    key=lambda x: x[1], default=('satisfying_video', 0)
-                )[0]
-            },
-            "recent_activity": [
-                {
-                    "type": post['type'],
-                    "engagement": post['engagement'],
-                    "days_ago": (datetime.now() - datetime.strptime(post['date_posted'], '%Y-%m-%d')).days,
-                    "caption_preview": post['caption'][:80] + "..."
-                } for post in recent_posts[:5]
-            ],
-            "top_performers": [
-                {
-                    "type": post['type'],
-                    "engagement": post['engagement'],
-                    "hashtags": post['hashtags'][:3],
-                    "caption_preview": post['caption'][:60] + "..."
-                } for post in high_performers[:3]
-            ],
-            "content_gaps": content_gaps,
-            "posting_rhythm": posting_rhythm,
-            "best_hashtags": list(analysis.get('best_performing_hashtags', {}).keys())[:5]
-        }
+        account_data = self._format_briefing(
+            analysis, recent_posts, high_performers, content_gaps, posting_rhythm, now
+        )
 
         briefing = f"""
 NEXT POST RECOMMENDATION BRIEFING
@@ -154,7 +135,7 @@ NEXT POST RECOMMENDATION BRIEFING
 Context: {context or 'Regular content planning'}
 
 ACCOUNT DATA:
-{json.dumps(briefing_data, indent=2)}
+{account_data}
 
 TASK: Recommend the NEXT specific story and feed post to maximize engagement.
 
@@ -177,13 +158,67 @@ Focus on:
         
         return self._extract_recommendations(chat_result)
 
+    def _format_briefing(self, analysis: Dict, recent_posts: List[Dict], high_performers: List[Dict],
+                         content_gaps: Dict, posting_rhythm: Dict, now: datetime) -> str:
+        """Render the account data section of the agent briefing as plain text"""
+        top_performing_type = max(
+            analysis.get('avg_engagement_by_type', {}).items(),
+            key=lambda x: x[1], default=('satisfying_video', 0)
+        )[0]
+
+        lines = [
+            "Account overview:",
+            f"- Total posts: {analysis.get('total_posts', 0)}",
+            f"- Average engagement: {analysis.get('avg_engagement', 0):.1f}",
+            f"- Content types: {self._format_value(analysis.get('type_distribution', {}))}",
+            f"- Top performing type: {top_performing_type}",
+            "",
+            "Recent activity (most recent first):"
+        ]
+        lines.extend(
+            f"- {post['type']} ({post['engagement']} engagement, "
+            f"{(now - datetime.fromisoformat(post['date_posted'])).days} days ago): "
+            f"{post['caption'][:80]}..."
+            for post in recent_posts[:5]
+        )
+
+        lines.extend(["", "Top performers:"])
+        lines.extend(
+            f"- {post['type']} ({post['engagement']} engagement, hashtags: "
+            f"{self._format_value(post['hashtags'][:3])}): {post['caption'][:60]}..."
+            for post in high_performers[:3]
+        )
+        if not high_performers:
+            lines.append("- none")
+
+        for title, section in (("Content gaps:", content_gaps), ("Posting rhythm:", posting_rhythm)):
+            lines.extend(["", title])
+            lines.extend(
+                f"- {key.replace('_', ' ').capitalize()}: {self._format_value(value)}"
+                for key, value in section.items()
+            )
+
+        best_hashtags = list(analysis.get('best_performing_hashtags', {}).keys())[:5]
+        lines.extend(["", f"Best hashtags: {self._format_value(best_hashtags)}"])
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def _format_value(value) -> str:
+        """Format a briefing value (list, dict or scalar) as compact text"""
+        if isinstance(value, dict):
+            return ", ".join(f"{key}: {item}" for key, item in value.items()) or "none"
+        if isinstance(value, list):
+            return ", ".join(str(item) for item in value) or "none"
+        return str(value)
+
     def _analyze_content_gaps(self, recent_posts: List[Dict]) -> Dict:
         """Identify what content types are missing recently"""
         if not recent_posts:
             return {"gap_analysis": "No recent posts to analyze"}
             
         recent_types = [post['type'] for post in recent_posts[:7]]  # Last 7 posts
-        type_counts = {t: recent_types.count(t) for t in set(recent_types)}
+        type_counts = dict(Counter(recent_types))
         
         all_types = ['satisfying_video', 'promotion', 'educational', 'behind_scenes']
         missing_types = [t for t in all_types if t not in recent_types]
@@ -194,15 +229,15 @@ Focus on:
             "overused_types": [t for t, count in type_counts.items() if count >= 3]
         }
 
-    def _analyze_posting_rhythm(self, recent_posts: List[Dict]) -> Dict:
+    def _analyze_posting_rhythm(self, recent_posts: List[Dict], now: datetime) -> Dict:
         """Analyze posting frequency and timing patterns"""
         if len(recent_posts) < 2:
             return {"rhythm": "Not enough posts to analyze rhythm"}
             
-        dates = [datetime.strptime(post['date_posted'], '%Y-%m-%d') for post in recent_posts]
+        dates = [datetime.fromisoformat(post['date_posted']) for post in recent_posts]
         dates.sort(reverse=True)  # Most recent first
         
-        days_since_last = (datetime.now() - dates[0]).days
+        days_since_last = (now - dates[0]).days
         
         # Calculate average gap between posts
         gaps = [(dates[i] - dates[i+1]).days for i in range(len(dates)-1)]
@@ -267,38 +302,28 @@ Focus on:
         return output
 
 # Simplified CLI focused on recommendations
-app = typer.Typer(help="Get your next Instagram story and feed post recommendations")
-
-@app.command("next")
-def get_next_recommendations(
-    context: str = typer.Option("", help="Current situation or goals (e.g., 'launching new service', 'slow engagement lately')")
-):
+def get_next_recommendations(context: str = "", backend: str = "auto"):
     """Get AI recommendations for your next Instagram story and feed post"""
     
     if not os.getenv('OPENAI_API_KEY'):
-        typer.echo(" Please set OPENAI_API_KEY environment variable")
-        typer.echo(" Or use the basic version: python cli.py generate-prompt")
+        print(" Please set OPENAI_API_KEY environment variable")
+        print(" Or use the basic version: python cli.py generate-prompt")
         return
     
-    typer.echo("Analyzing your content patterns...")
-    typer.echo("AI agents collaborating on your next posts...")
+    print("Analyzing your content patterns...")
+    print("AI agents collaborating on your next posts...")
     
-    system = InstagramPostRecommender()
+    system = InstagramPostRecommender(backend)
     recommendations = system.get_next_post_recommendations(context)
     
-    typer.echo("\n" + recommendations)
-
-@app.command("add")
-def add_existing_post(
-    caption: str = typer.Argument(..., help="Your post caption/description"),
-    post_type: str = typer.Argument(..., help="Type: satisfying_video, promotion, educational, behind_scenes"),
-    engagement: int = typer.Argument(..., help="Total engagement (likes + comments + saves)"),
-    hashtags: str = typer.Option("", help="Comma-separated hashtags"),
-    days_ago: int = typer.Option(0, help="How many days ago was this posted?")
-):
+    print("\n" + recommendations)
+
+def add_existing_post(caption: str, post_type: str, engagement: int,
+                      hashtags: str = "", days_ago: int = 0, backend: str = "auto"):
     """Add one of your existing posts to build the recommendation database"""
+    from Database import open_database
     
-    rag_db = RAGDatabase()
+    rag_db = open_database(backend)
     
     hashtag_list = [tag.strip() for tag in hashtags.split(",") if tag.strip()]
     post_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d")
@@ -312,20 +337,21 @@ def add_existing_post(
     }
     
     post_id = rag_db.add_post(post_data)
-    typer.echo(f"Added: '{caption[:50]}...' ({engagement} engagement, {days_ago} days ago)")
+    print(f"Added: '{caption[:50]}...' ({engagement} engagement, {days_ago} days ago)")
     
     # Give quick recommendation tip
     total_posts = rag_db.get_post_count()
     if total_posts >= 3:
-        typer.echo(f"You now have {total_posts} posts. Try: python app.py next")
+        print(f"You now have {total_posts} posts. Try: python app.py next")
 
-@app.command("quick-setup")
-def quick_setup():
+def quick_setup(backend: str = "auto"):
     """Add sample posts to test the system immediately"""
     
-    typer.echo(" Setting up sample window cleaning business posts...")
+    from Database import open_database
+    
+    print(" Setting up sample window cleaning business posts...")
     
-    rag_db = RAGDatabase()
+    rag_db = open_database(backend)
     
     # Sample posts with realistic data
     samples = [
@@ -337,22 +363,59 @@ def quick_setup():
         ("Why we use distilled water: It prevents mineral spots and gives that perfect finish", "educational", 1400, "#education,#windowcleaning,#water,#professional", 15)
     ]
     
-    for caption, post_type, engagement, hashtags, days_ago in samples:
-        post_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d")
-        hashtag_list = [tag.strip() for tag in hashtags.split(",")]
-        
-        post_data = {
+    # Build every sample up front so they are embedded and stored in one batch
+    now = datetime.now()
+    all_posts = [
+        {
             "caption": caption,
             "type": post_type,
             "engagement": engagement,
-            "hashtags": hashtag_list,
-            "date_posted": post_date
+            "hashtags": [tag.strip() for tag in hashtags.split(",")],
+            "date_posted": (now - timedelta(days=days_ago)).strftime("%Y-%m-%d")
         }
-        rag_db.add_post(post_data)
+        for caption, post_type, engagement, hashtags, days_ago in samples
+    ]
+    
+    rag_db.add_posts(all_posts)
     
-    typer.echo(f"Added {len(samples)} sample posts!")
-    typer.echo("Now try: python app.py next")
-    typer.echo("Or add your real posts with: python app.py add")
+    print(f"Added {len(samples)} sample posts!")
+    print("Now try: python app.py next")
+    print("Or add your real posts with: python app.py add")
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser"""
+    parser = argparse.ArgumentParser(
+        description="Get your next Instagram story and feed post recommendations"
+    )
+    parser.add_argument(
+        "--backend", choices=["auto", "chroma", "faiss"], default="auto",
+        help="Post store: exact FAISS index for small accounts, or ChromaDB (auto keeps the existing store)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    next_parser = subparsers.add_parser("next", help=get_next_recommendations.__doc__)
+    next_parser.add_argument("--context", default="", help="Current situation or goals (e.g., 'launching new service', 'slow engagement lately')")
+    next_parser.set_defaults(func=get_next_recommendations)
+    
+    add_parser = subparsers.add_parser("add", help=add_existing_post.__doc__)
+    add_parser.add_argument("caption", help="Your post caption/description")
+    add_parser.add_argument("post_type", help="Type: satisfying_video, promotion, educational, behind_scenes")
+    add_parser.add_argument("engagement", type=int, help="Total engagement (likes + comments + saves)")
+    add_parser.add_argument("--hashtags", default="", help="Comma-separated hashtags")
+    add_parser.add_argument("--days-ago", type=int, default=0, help="How many days ago was this posted?")
+    add_parser.set_defaults(func=add_existing_post)
+    
+    setup_parser = subparsers.add_parser("quick-setup", help=quick_setup.__doc__)
+    setup_parser.set_defaults(func=quick_setup)
+    
+    return parser
+
+def main(argv: Optional[List[str]] = None):
+    """Parse the command line and run the selected command"""
+    args = vars(build_parser().parse_args(argv))
+    command = args.pop("func")
+    args.pop("command")
+    command(**args)
 
 if __name__ == "__main__":
-    app()
+    main()